@@ -4,8 +4,9 @@
 
 import argparse
 from ccmm.dats.datsobj import DatsObj, DatsObjCache
-from collections import OrderedDict
-from ccmm.dats.datsobj import DATSEncoder
+from collections import Counter, OrderedDict
+from ccmm.dats.datsobj import write_dats_json
+import ccmm.dbgap.consent_groups
 import ccmm.gtex.dna_extracts
 import ccmm.gtex.wgs_datasets
 import ccmm.gtex.public_metadata
@@ -14,7 +15,6 @@ import ccmm.gtex.samples
 import ccmm.gtex.subjects
 import ccmm.gtex.parsers.portal_files as portal_files
 import ccmm.gtex.parsers.github_files as github_files
-import json
 import logging
 import os
 import re
@@ -34,64 +34,68 @@ RNASEQ_MANIFEST_FILE = 'rnaseq_cram_files_v7_datacommons_011516.txt'
 WGS_DOIS_FILE = 'wgs_dois_2018-10-01.txt'
 RNASEQ_DOIS_FILE = 'rnaseq_dois_2018-10-01.txt'
 
+# root logger, used directly in cross_check_ids to skip the module-level logging function wrappers
+LOGGER = logging.getLogger()
+
+# versioned dbGaP study id (e.g., phs000424.v7) from the full accession (e.g., phs000424.v7.p2)
+DBGAP_STUDY_ID_RE = re.compile(r'^(phs\d+\.v\d+)\.p\d+$')
+
+# GTEx subject id, i.e., the first two '-'-separated fields of a sample id
+SUBJECT_ID_RE = re.compile(r'(GTEX|K)-[A-Z0-9+]+')
+
 # ------------------------------------------------------
 # Check sample ids between files
 # ------------------------------------------------------
 
 # check for sample and subject ids that appear in the manifest files but not the id dumps
 def cross_check_ids(subjects, samples, manifest, filename, manifest_descr, source_descr):
-    n_samp_found = 0
-    n_samp_not_found = 0
-    sample_d = {}
-    n_subj_found = 0
-    n_subj_not_found = 0
-    subject_d = {}
-
-    n_id_dump_subjects = len(subjects.keys())
-    n_id_dump_samples = len(samples.keys())
-
-    # count distinct subject and sample ids from the specified manifest file
-    for k in manifest:
-        entry = manifest[k]
-
-        # check manifest sample_id
-        sample_id = entry['sample_id']['raw_value']
-        # sample ids should be unique:
-        if sample_id in sample_d:
-            logging.error("found duplicate sample id '" + sample_id + "' in " + filename)
-            continue
-        sample_d[sample_id] = True
-        if sample_id in samples:
-            n_samp_found += 1
-        else:
-            n_samp_not_found += 1
-#            logging.warn("found sample id '" + sample_id + "' in manifest file but not id_dump file")
+    n_id_dump_subjects = len(subjects)
+    n_id_dump_samples = len(samples)
+
+    # distinct sample ids from the specified manifest file
+    manifest_sample_l = [manifest[k]['sample_id']['raw_value'] for k in manifest]
+    manifest_samples = set(manifest_sample_l)
+    # sample ids should be unique:
+    if len(manifest_samples) != len(manifest_sample_l):
+        seen = set()
+        for sample_id in manifest_sample_l:
+            if sample_id in seen:
+                LOGGER.error("found duplicate sample id '%s' in %s", sample_id, filename)
+            seen.add(sample_id)
+
+    n_samp_found = len(manifest_samples & samples.keys())
+    n_samp_not_found = len(manifest_samples) - n_samp_found
+
+    # distinct subject ids, parsed from the manifest sample ids
+    # e.g., GTEX-1117F-0226-SM-5GZZ7 -> GTEX-1117F, K-562-SM-26GMQ -> K-562
+    manifest_subjects = set()
+    for sample_id in manifest_samples:
+        subject_id = '-'.join(sample_id.split('-', 2)[0:2])
+        if SUBJECT_ID_RE.fullmatch(subject_id) is None:
+            LOGGER.critical("couldn't parse GTEx subject id from sample_id '%s' in %s", sample_id, filename)
+            sys.exit(1)
+        manifest_subjects.add(subject_id)
 
-        # check subject_id
-        m = re.match(r'^((GTEX|K)-[A-Z0-9+]+).*$', sample_id)
-        if m is None:
-            fatal_parse_error("couldn't parse GTEx subject id from sample_id '" + sample_id + "'")
-        subject_id = m.group(1)
-        if subject_id in subject_d:
-            continue
-        else:
-            subject_d[subject_id] = True
-        if subject_id in subjects:
-            n_subj_found += 1
-        else:
-            n_subj_not_found += 1
-            logging.warn("found subject id '" + subject_id + "' in manifest file but not id_dump file")
+    subjects_not_found = manifest_subjects - subjects.keys()
+    n_subj_found = len(manifest_subjects) - len(subjects_not_found)
+    n_subj_not_found = len(subjects_not_found)
+    for subject_id in sorted(subjects_not_found):
+        LOGGER.warning("found subject id '%s' in manifest file but not in %s", subject_id, source_descr)
+
+    # skip building the summary strings if they won't be logged
+    if not LOGGER.isEnabledFor(logging.INFO):
+        return
 
-    logging.info("comparing GitHub GTEx " + manifest_descr + " manifest files with " + source_descr)
+    LOGGER.info("comparing GitHub GTEx %s manifest files with %s", manifest_descr, source_descr)
     samp_compare_str = '{:>10s}  sample_ids in {:>20s}: {:-6} / {:-6}'.format(manifest_descr, source_descr, n_samp_found, n_id_dump_samples) 
     samp_compare_str += '           '
     samp_compare_str += '{:>10s}  sample_ids  NOT in {:>20s}: {:-6} / {:-6}'.format(manifest_descr, source_descr, n_samp_not_found, n_id_dump_samples)
-    logging.info(samp_compare_str)
+    LOGGER.info(samp_compare_str)
 
     subj_compare_str = '{:>10s} subject_ids in {:>20s}: {:-6} / {:-6}'.format(manifest_descr, source_descr, n_subj_found,n_id_dump_subjects)
     subj_compare_str += '           '
     subj_compare_str += '{:>10s} subject_ids  NOT in {:>20s}: {:-6} / {:-6}'.format(manifest_descr, source_descr, n_subj_not_found, n_id_dump_subjects)
-    logging.info(subj_compare_str)
+    LOGGER.info(subj_compare_str)
 
 # ------------------------------------------------------
 # Handle restricted-access metadata
@@ -131,28 +135,7 @@ def make_consent_group(args, group_name, group_index, subject_l, dats_subject_d)
     #   0 - Subjects did not participate in the study, did not complete a consent document and 
     #       are included only for the pedigree structure and/or genotype controls, such as HapMap subjects
     #   1 - General Research Use (GRU)
-    consent_info = None
-    if group_name == "General Research Use (GRU)":
-        # Data Use Ontology for consent info - http://www.obofoundry.org/ontology/duo.html
-        #  http://purl.obolibrary.org/obo/DUO_0000005 - "general research use and clinical care"
-        #  "This primary category consent code indicates that use is allowed for health/medical/biomedical 
-        # purposes and other biological research, including the study of population origins or ancestry."
-        consent_info = DatsObj("ConsentInfo", [
-            ("name", group_name),
-            ("abbreviation", "GRU"),
-            ("description", group_name),
-            ("relatedIdentifiers", [
-                DatsObj("RelatedIdentifier", [("identifier", "http://purl.obolibrary.org/obo/DUO_0000005")])
-            ])
-        ])
-    elif group_name == "Subjects did not participate in the study, did not complete a consent document and are included only for the pedigree structure and/or genotype controls, such as HapMap subjects":
-        consent_info = DatsObj("ConsentInfo", [
-            ("name", group_name),
-            ("description", group_name)
-        ])
-    else:
-        logging.fatal("unrecognized consent group " + group_name)
-        sys.exit(1)
+    consent_info = ccmm.dbgap.consent_groups.make_consent_info(group_name, ccmm.dbgap.consent_groups.COMMON_CONSENT_GROUPS)
 
     group = DatsObj("StudyGroup", [
         ("name", group_name),
@@ -165,9 +148,11 @@ def make_consent_group(args, group_name, group_index, subject_l, dats_subject_d)
     if args.no_circular_links:
         logging.warn("not creating Subject level circular links because of --no_circular_links option")
     else:
+        # all subjects share a single Dimension object that references the group
+        member_dim = DatsObj("Dimension", [("name", "member of study group"), ("values", [ group.getIdRef() ])])
         for s in dats_subjects_l:
             cl = s.get("characteristics")
-            cl.append(DatsObj("Dimension", [("name", "member of study group"), ("values", [ group.getIdRef() ])]))
+            cl.append(member_dim)
     return group
 
 # augment public metadata with restricted-access (meta)data
@@ -240,11 +225,13 @@ def main():
     parser.add_argument('--output_file', required=True, help ='Output file path for the DATS JSON file containing the top-level DATS Dataset.')
     parser.add_argument('--dbgap_public_xml_path', required=True, help ='Path to directory that contains public dbGaP metadata files e.g., *.data_dict.xml and *.var_report.xml')
     parser.add_argument('--dbgap_protected_metadata_path', required=False, help ='Path to directory that contains access-controlled dbGaP tab-delimited metadata files.')
-    parser.add_argument('--max_output_samples', required=False, type=int, help ='Impose a limit on the number of sample Materials in the output DATS. For testing purposes only.')
+    parser.add_argument('--max_output_samples', required=False, type=int, help ='Impose a limit on the number of sample Materials in the output DATS and on the number of CRAM files read from each manifest file. The manifest limit keeps the first N rows of each manifest in file order, so the CRAM file Datasets need not correspond to the N retained samples (the first N in sorted order by name). For testing purposes only.')
     parser.add_argument('--subject_phenotypes_path', default=V7_SUBJECT_PHENOTYPES_FILE, required=False, help ='Path to ' + V7_SUBJECT_PHENOTYPES_FILE)
     parser.add_argument('--sample_attributes_path', default=V7_SAMPLE_ATTRIBUTES_FILE, required=False, help ='Path to ' + V7_SAMPLE_ATTRIBUTES_FILE)
     parser.add_argument('--data_stewards_repo_path', default='data-stewards', required=False, help ='Path to local copy of https://github.com/dcppc/data-stewards')
     parser.add_argument('--no_circular_links', action='store_true', help ='Whether to disallow circular links/paths within the JSON-LD output.')
+    parser.add_argument('--pretty', action='store_true', help ='Whether to indent the JSON-LD output for readability. By default the output is compact.')
+    parser.add_argument('--use_orjson', action='store_true', help ='Write the JSON-LD output with orjson (must be installed). Faster, but non-ASCII characters and some numbers are encoded differently than by the default json module.')
     parser.add_argument('--use_all_dbgap_subject_vars', action='store_true', help ='Whether to store all available dbGaP variable values as characteristics of the DATS subject Materials.')
 #    parser.add_argument('--use_all_dbgap_sample_vars', action='store_true', help ='Whether to store all available dbGaP variable values as characteristics of the DATS sample Materials.')
     args = parser.parse_args()
@@ -270,9 +257,9 @@ def main():
 
     # manifest files
     protected_rnaseq_manifest = args.data_stewards_repo_path + "/gtex/v7/manifests/protected_data/" + RNASEQ_MANIFEST_FILE
-    protected_rnaseq_files = github_files.read_protected_rnaseq_manifest(protected_rnaseq_manifest)
+    protected_rnaseq_files = github_files.read_protected_rnaseq_manifest(protected_rnaseq_manifest, args.max_output_samples)
     protected_wgs_manifest = args.data_stewards_repo_path + "/gtex/v7/manifests/protected_data/" + WGS_MANIFEST_FILE
-    protected_wgs_files = github_files.read_protected_wgs_manifest(protected_wgs_manifest)
+    protected_wgs_files = github_files.read_protected_wgs_manifest(protected_wgs_manifest, args.max_output_samples)
 
     # DOIs
     rnaseq_dois_file = args.data_stewards_repo_path + "/gtex/v7/manifests/protected_data/" + RNASEQ_DOIS_FILE
@@ -280,29 +267,33 @@ def main():
     wgs_dois_file = args.data_stewards_repo_path + "/gtex/v7/manifests/protected_data/" + WGS_DOIS_FILE
     wgs_dois = github_files.read_dois_manifest(wgs_dois_file)
 
-    # compare GitHub manifest files with GitHub id dumps
-    cross_check_ids(gh_subjects, gh_samples, protected_rnaseq_files, protected_rnaseq_manifest, "RNA-Seq", "GitHub id dumps")
-    cross_check_ids(gh_subjects, gh_samples, protected_wgs_files, protected_wgs_manifest, "WGS","GitHub id dumps")
+    # the cross-checks are informational only, and would be incomplete for truncated manifests
+    if args.max_output_samples is not None:
+        logging.warn("skipping manifest id cross-checks because of --max_output_samples option")
+    else:
+        # compare GitHub manifest files with GitHub id dumps
+        cross_check_ids(gh_subjects, gh_samples, protected_rnaseq_files, protected_rnaseq_manifest, "RNA-Seq", "GitHub id dumps")
+        cross_check_ids(gh_subjects, gh_samples, protected_wgs_files, protected_wgs_manifest, "WGS","GitHub id dumps")
 
-    # compare GitHub manifest files with GTEx Portal metdata files
-    cross_check_ids(p_subjects, p_samples, protected_rnaseq_files, protected_rnaseq_manifest, "RNA-Seq", "GTEx Portal metadata")
-    cross_check_ids(p_subjects, p_samples, protected_wgs_files, protected_wgs_manifest, "WGS","GTEx Portal metadata")
+        # compare GitHub manifest files with GTEx Portal metdata files
+        cross_check_ids(p_subjects, p_samples, protected_rnaseq_files, protected_rnaseq_manifest, "RNA-Seq", "GTEx Portal metadata")
+        cross_check_ids(p_subjects, p_samples, protected_wgs_files, protected_wgs_manifest, "WGS","GTEx Portal metadata")
 
     # create top-level dataset
     gtex_dataset = ccmm.gtex.wgs_datasets.get_dataset_json()
 
     # index dbGaP study Datasets by id
-    dbgap_study_datasets_by_id = {}
-    for tds in gtex_dataset.get("hasPart"):
-        dbgap_study_id = tds.get("identifier").get("identifier")
-        if dbgap_study_id in dbgap_study_datasets_by_id:
-            logging.fatal("encountered duplicate study_id " + dbgap_study_id)
-            sys.exit(1)
-        m = re.match(r'^(phs\d+\.v\d+)\.p\d+$', dbgap_study_id)
+    study_id_matches = [(DBGAP_STUDY_ID_RE.match(tds.get("identifier").get("identifier")), tds) for tds in gtex_dataset.get("hasPart")]
+    for (m, tds) in study_id_matches:
         if m is None:
-            logging.fatal("unable to parse study_id " + dbgap_study_id)
+            logging.fatal("unable to parse study_id " + tds.get("identifier").get("identifier"))
             sys.exit(1)
-        dbgap_study_datasets_by_id[m.group(1)] = tds
+    dbgap_study_datasets_by_id = {m.group(1): tds for (m, tds) in study_id_matches}
+    if len(dbgap_study_datasets_by_id) != len(study_id_matches):
+        study_id_counts = Counter(m.group(1) for (m, tds) in study_id_matches)
+        dup_study_ids = sorted([sid for sid in study_id_counts if study_id_counts[sid] > 1])
+        logging.fatal("encountered duplicate study_id(s): " + ", ".join(dup_study_ids))
+        sys.exit(1)
 
     # read public dbGaP metadata
     pub_xp = args.dbgap_public_xml_path
@@ -310,12 +301,11 @@ def main():
     # read public metadata
     dbgap_study_pub_md = ccmm.gtex.public_metadata.read_study_metadata(pub_xp)
     # there should be only one study
-    study_ids = [k for k in dbgap_study_pub_md.keys()]
-    n_study_ids =len(study_ids)
-    study_id = study_ids[0]
+    n_study_ids = len(dbgap_study_pub_md)
     if n_study_ids != 1:
         logging.fatal("read " + str(n_study_ids) + " dbGaP studies from " + pub_xp)
         sys.exit(1)
+    study_id = next(iter(dbgap_study_pub_md))
 
     dbgap_study_dataset = dbgap_study_datasets_by_id[study_id]
     dbgap_study_md = dbgap_study_pub_md[study_id]
@@ -336,7 +326,7 @@ def main():
     # create subjects based on GTEx Portal subject phenotype file and GitHub data-stewards id dump
     dats_subjects_d = ccmm.gtex.subjects.get_subjects_dats_materials(cache, p_subjects, gh_subjects, dbgap_study_md['type_name_cg_to_var']['Subject_Phenotypes'])
     # sorted list of subjects
-    dats_subjects_l = sorted([dats_subjects_d[s] for s in dats_subjects_d], key=lambda s: s.get("name"))
+    dats_subjects_l = sorted(dats_subjects_d.values(), key=lambda s: s.get("name"))
 
     # TODO - add consent groups, of which GTEx has 2: 0=didn't participate, 1=General Research Use (GRU)
     
@@ -353,9 +343,11 @@ def main():
     if args.no_circular_links:
         logging.warn("not creating Subject level circular links because of --no_circular_links option")
     else:
+        # all subjects share a single Dimension object that references the group
+        member_dim = DatsObj("Dimension", [("name", "member of study group"), ("values", [ all_subjects.getIdRef() ])])
         for s in dats_subjects_l:
             cl = s.get("characteristics")
-            cl.append(DatsObj("Dimension", [("name", "member of study group"), ("values", [ all_subjects.getIdRef() ])]))
+            cl.append(member_dim)
 
     dats_study = DatsObj("Study", [
             ("name", "GTEx"),
@@ -372,7 +364,7 @@ def main():
     # create samples based on GTEx Portal sample attributes file and GitHub data-stewards id dump
     dats_samples_d = ccmm.gtex.samples.get_samples_dats_materials(cache, dats_subjects_d, p_samples, gh_samples, dbgap_study_md['type_name_cg_to_var']['Sample_Attributes'])
     # sorted list of samples
-    dats_samples_l = sorted([dats_samples_d[s] for s in dats_samples_d], key=lambda s: s.get("name"))
+    dats_samples_l = sorted(dats_samples_d.values(), key=lambda s: s.get("name"))
     if args.max_output_samples is not None:
         dats_samples_l = dats_samples_l[0:int(args.max_output_samples)]
         logging.warn("limiting output to " + str(len(dats_samples_l)) + " sample(s) due to value of --max_output_samples")
@@ -402,8 +394,7 @@ def main():
         add_restricted_data(cache, args, dbgap_study_md, dats_subjects_l, dats_samples_d, dats_study, study_id)
 
     # write Dataset to DATS JSON file
-    with open(args.output_file, mode="w") as jf:
-        jf.write(json.dumps(gtex_dataset, indent=2, cls=DATSEncoder))
+    write_dats_json(gtex_dataset, args.output_file, args.pretty, args.use_orjson)
 
 if __name__ == '__main__':
     main()
@@ -4,8 +4,9 @@
 
 import argparse
 from ccmm.dats.datsobj import DatsObj, DatsObjCache
-from collections import OrderedDict
-from ccmm.dats.datsobj import DATSEncoder
+from collections import Counter, OrderedDict
+from ccmm.dats.datsobj import write_dats_json
+import ccmm.dbgap.consent_groups
 import ccmm.topmed.samples
 import ccmm.topmed.subjects
 import ccmm.topmed.dna_extracts
@@ -13,7 +14,6 @@ import ccmm.topmed.wgs_datasets
 import ccmm.topmed.public_metadata
 import ccmm.topmed.restricted_metadata
 import ccmm.topmed.parsers.manifest_files as manifest_files
-import json
 import logging
 import os
 import re
@@ -23,6 +23,24 @@ import sys
 SUBJ_ID = 1
 SAMP_ID = 1
 
+# versioned dbGaP study id (e.g., phs001024.v3) from the full accession (e.g., phs001024.v3.p1)
+DBGAP_STUDY_ID_RE = re.compile(r'^(phs\d+\.v\d+)\.p\d+$')
+
+# ------------------------------------------------------
+# Consent groups
+# ------------------------------------------------------
+
+CONSENT_GROUPS = {
+    **ccmm.dbgap.consent_groups.COMMON_CONSENT_GROUPS,
+    # http://purl.obolibrary.org/obo/DUO_0000006 - "health/medical/biomedical research and clinical care"
+    # "This primary category consent code indicates that use is allowed for health/medical/biomedical purposes; 
+    # does not include the study of population origins or ancestry."
+    "Health/Medical/Biomedical (HMB)": ("HMB", "http://purl.obolibrary.org/obo/DUO_0000006"),
+    # TODO -  use more specific DUO term
+    # http://purl.obolibrary.org/obo/DUO_0000006 - "disease-specific research and clinical care"
+    "Disease-Specific (COPD and Smoking, RD) (DS-CS-RD)": ("DS-CS-RD", "http://purl.obolibrary.org/obo/DUO_0000007")
+}
+
 # ------------------------------------------------------
 # Create DATS StudyGroups from restricted access data
 # ------------------------------------------------------
@@ -46,55 +64,7 @@ def make_consent_group(args, group_name, group_index, subject_l, dats_subject_d)
 
     # create StudyGroup and associated ConsentInfo
 
-    # only 2 consent groups in GTEx study:
-    #   0 - Subjects did not participate in the study, did not complete a consent document and 
-    #       are included only for the pedigree structure and/or genotype controls, such as HapMap subjects
-    #   1 - General Research Use (GRU)
-    consent_info = None
-    if group_name == "General Research Use (GRU)":
-        # Data Use Ontology for consent info - http://www.obofoundry.org/ontology/duo.html
-        #  http://purl.obolibrary.org/obo/DUO_0000005 - "general research use and clinical care"
-        #  "This primary category consent code indicates that use is allowed for health/medical/biomedical 
-        # purposes and other biological research, including the study of population origins or ancestry."
-        consent_info = DatsObj("ConsentInfo", [
-            ("name", group_name),
-            ("abbreviation", "GRU"),
-            ("description", group_name),
-            ("relatedIdentifiers", [
-                DatsObj("RelatedIdentifier", [("identifier", "http://purl.obolibrary.org/obo/DUO_0000005")])
-            ])
-        ])
-    elif group_name == "Health/Medical/Biomedical (HMB)":
-        # http://purl.obolibrary.org/obo/DUO_0000006 - "health/medical/biomedical research and clinical care"
-        # "This primary category consent code indicates that use is allowed for health/medical/biomedical purposes; 
-        # does not include the study of population origins or ancestry."
-        consent_info = DatsObj("ConsentInfo", [
-            ("name", group_name),
-            ("abbreviation", "HMB"),
-            ("description", group_name),
-            ("relatedIdentifiers", [
-                DatsObj("RelatedIdentifier", [("identifier", "http://purl.obolibrary.org/obo/DUO_0000006")])
-            ])
-        ])
-    elif group_name == "Disease-Specific (COPD and Smoking, RD) (DS-CS-RD)":
-        # TODO -  use more specific DUO term
-        # http://purl.obolibrary.org/obo/DUO_0000006 - "disease-specific research and clinical care"
-        consent_info = DatsObj("ConsentInfo", [
-            ("name", group_name),
-            ("abbreviation", "DS-CS-RD"),
-            ("description", group_name),
-            ("relatedIdentifiers", [
-                DatsObj("RelatedIdentifier", [("identifier", "http://purl.obolibrary.org/obo/DUO_0000007")])
-            ])
-        ])
-    elif group_name == "Subjects did not participate in the study, did not complete a consent document and are included only for the pedigree structure and/or genotype controls, such as HapMap subjects":
-        consent_info = DatsObj("ConsentInfo", [
-            ("name", group_name),
-            ("description", group_name)
-        ])
-    else:
-        logging.fatal("unrecognized consent group " + group_name)
-        sys.exit(1)
+    consent_info = ccmm.dbgap.consent_groups.make_consent_info(group_name, CONSENT_GROUPS)
 
     group = DatsObj("StudyGroup", [
         ("name", group_name),
@@ -107,9 +77,11 @@ def make_consent_group(args, group_name, group_index, subject_l, dats_subject_d)
     if args.no_circular_links:
         logging.warn("not creating Subject level circular links because of --no_circular_links option")
     else:
+        # all subjects share a single Dimension object that references the group
+        member_dim = DatsObj("Dimension", [("name", "member of study group"), ("values", [ group.getIdRef() ])])
         for s in dats_subjects_l:
             cl = s.get("characteristics")
-            cl.append(DatsObj("Dimension", [("name", "member of study group"), ("values", [ group.getIdRef() ])]))
+            cl.append(member_dim)
     return group
 
 def add_study_groups(cache, args, study_md, study_restricted_md, subjects_l, dats_study, study_id):
@@ -195,7 +167,7 @@ def process_study(args, cache, topmed_dataset, dbgap_study_dataset, study_id, st
         dats_subjects_d = ccmm.topmed.subjects.get_subjects_dats_materials_from_restricted_metadata(cache, dbgap_study_dataset, study_md, study_res_md)
 
     # sorted list of subjects
-    dats_subjects_l = sorted([dats_subjects_d[s] for s in dats_subjects_d], key=lambda s: s.get("name"))
+    dats_subjects_l = sorted(dats_subjects_d.values(), key=lambda s: s.get("name"))
     logging.info("created " + str(len(dats_subjects_l)) + " subject Materials")
 
     # create 'all subjects' StudyGroup
@@ -235,7 +207,7 @@ def process_study(args, cache, topmed_dataset, dbgap_study_dataset, study_id, st
         # samples indexed by dbGaP_Sample_ID from restricted metadata
         dats_samples_d = ccmm.topmed.samples.get_samples_dats_materials_from_restricted_metadata(cache, dats_subjects_d, dbgap_study_dataset, study_md, study_res_md)
 
-    dats_samples_l = sorted([dats_samples_d[s] for s in dats_samples_d], key=lambda s: s.get("name"))
+    dats_samples_l = sorted(dats_samples_d.values(), key=lambda s: s.get("name"))
     logging.info("created " + str(len(dats_samples_l)) + " sample Materials")
     dbgap_study_dataset.set("isAbout", dats_samples_l)
 
@@ -249,17 +221,13 @@ def process_study(args, cache, topmed_dataset, dbgap_study_dataset, study_id, st
         dbgap_study_dataset.set("hasPart", file_datasets_l)
 
         # filter samples not referenced by Datasets
-        referenced_samples = {}
+        referenced_samples = set()
         for fd in file_datasets_l:
             data_acq = fd.get("producedBy")
             for ds in data_acq.get("input"):
-                ds_id = ds.get("@id")
-                referenced_samples[ds_id] = True
+                referenced_samples.add(ds.get("@id"))
 
-        filtered_dats_samples_l = []
-        for ds in dats_samples_l:
-            if ds.get("@id") in referenced_samples:
-                filtered_dats_samples_l.append(ds)
+        filtered_dats_samples_l = [ds for ds in dats_samples_l if ds.get("@id") in referenced_samples]
 
         nfs = len(filtered_dats_samples_l)
         logging.info(str(nfs) + " sample Materials remain after filtering non-TOPMed samples")
@@ -280,6 +248,8 @@ def main():
     parser.add_argument('--manifest_file', required=False, help ='Path to directory that contains TOPMed file manifest for access-controlled data.')
     parser.add_argument('--guid_files', required=False, help ='Path to directory that contains the .tsv GUID files for TOPMed CRAM and VCF files and associated index files.')
     parser.add_argument('--no_circular_links', action='store_true', help ='Whether to disallow circular links/paths within the JSON-LD output.')
+    parser.add_argument('--pretty', action='store_true', help ='Whether to indent the JSON-LD output for readability. By default the output is compact.')
+    parser.add_argument('--use_orjson', action='store_true', help ='Write the JSON-LD output with orjson (must be installed). Faster, but non-ASCII characters and some numbers are encoded differently than by the default json module.')
     args = parser.parse_args()
 
     # logging
@@ -295,18 +265,19 @@ def main():
     topmed_dataset = ccmm.topmed.wgs_datasets.get_dataset_json(acc_l)
 
     # index studies by id
-    studies_by_id = {}
-    for tds in topmed_dataset.get("hasPart"):
-        study_id = tds.get("identifier").get("identifier")
-        if study_id in studies_by_id:
-            logging.fatal("encountered duplicate study_id " + study_id)
-            sys.exit(1)
-        m = re.match(r'^(phs\d+\.v\d+)\.p\d+$', study_id)
+    study_id_matches = [(DBGAP_STUDY_ID_RE.match(tds.get("identifier").get("identifier")), tds) for tds in topmed_dataset.get("hasPart")]
+    for (m, tds) in study_id_matches:
         if m is None:
-            logging.fatal("unable to parse study_id " + study_id)
+            logging.fatal("unable to parse study_id " + tds.get("identifier").get("identifier"))
             sys.exit(1)
-        studies_by_id[m.group(1)] = tds
-        logging.info("indexed study " + m.group(1))
+    studies_by_id = {m.group(1): tds for (m, tds) in study_id_matches}
+    if len(studies_by_id) != len(study_id_matches):
+        study_id_counts = Counter(m.group(1) for (m, tds) in study_id_matches)
+        dup_study_ids = sorted([sid for sid in study_id_counts if study_id_counts[sid] > 1])
+        logging.fatal("encountered duplicate study_id(s): " + ", ".join(dup_study_ids))
+        sys.exit(1)
+    for study_id in studies_by_id:
+        logging.info("indexed study " + study_id)
 
     sample_manifest = None
     file_guids = None
@@ -355,8 +326,7 @@ def main():
             process_study(args, cache, topmed_dataset, dbgap_study_dataset, study_id, study_pub_md, study_restricted_md, sample_manifest, file_guids)
 
     # write Dataset to DATS JSON file
-    with open(args.output_file, mode="w") as jf:
-        jf.write(json.dumps(topmed_dataset, indent=2, cls=DATSEncoder))
+    write_dats_json(topmed_dataset, args.output_file, args.pretty, args.use_orjson)
 
 if __name__ == '__main__':
     main()
@@ -1,12 +1,17 @@
 #!/usr/bin/env python3
 
-from collections import OrderedDict
 import json
 import logging
 import re
 import sys
 import uuid
 
+# optional: orjson may be used to write DATS JSON files (see write_dats_json)
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # ------------------------------------------------------
 # Global variables
 # ------------------------------------------------------
@@ -24,6 +29,9 @@ JSON_LD_OBO_FOUNDRY_CONTEXT_URI_PREFIX = 'https://datatagsuite.github.io/context
 #JSON_LD_SDO_CONTEXT_URI_PREFIX = './context/sdo/'
 #JSON_LD_OBO_FOUNDRY_CONTEXT_URI_PREFIX = './context/obo/'
 
+# size of the write buffer used by write_dats_json for indented output
+OUTPUT_BUFFER_SIZE = 8 * 1024 * 1024
+
 # debug flag - should remove all id references from the resulting instance when True
 DEBUG_NO_ID_REFS = False
 
@@ -73,8 +81,10 @@ DATS_TYPES = {
 # DatsObj
 # ------------------------------------------------------
 
+# properties are stored in a plain dict, which preserves insertion (i.e., JSON output) order in Python 3.7+
+# __slots__ avoids a per-instance __dict__ for the many thousands of objects created for a large study
 class DatsObj:
-    data = None
+    __slots__ = ('data', 'id_ref')
 
     def __init__(self, dats_type, atts = [], id = ""):
         # check that dats_type is valid
@@ -115,7 +125,8 @@ class DatsObj:
 
         dats_atts.append(("@id", id))
         dats_atts.extend(atts)
-        self.data = OrderedDict(dats_atts)
+        self.data = dict(dats_atts)
+        self.id_ref = None
 
     def getProperty(self, name):
         return self.data[name]
@@ -127,17 +138,20 @@ class DatsObj:
         return name in self.data
 
     def get(self, name):
-        return self.getProperty(name)
+        return self.data[name]
     
     def set(self, name, value):
-        self.setProperty(name, value)
+        self.data[name] = value
 
     def __str__(self):
         return json.dumps(self, indent=2, cls=DATSEncoder)
 
     # return object id in form suitable for use as JSON-LD id reference
+    # the same (read-only) dict is returned on every call, since @id is fixed at construction time
     def getIdRef(self):
-        return { "@id": self.data["@id"] }
+        if self.id_ref is None:
+            self.id_ref = { "@id": self.data["@id"] }
+        return self.id_ref
 
 # JSONEncoder for data structures that use DatsObj
 
@@ -147,6 +161,36 @@ class DATSEncoder(json.JSONEncoder):
             return o.data
         else:
             return json.JSONEncoder.default(self, o)
+
+# orjson equivalent of DATSEncoder.default
+def dats_orjson_default(o):
+    if isinstance(o, DatsObj):
+        return o.data
+    raise TypeError("Object of type " + type(o).__name__ + " is not JSON serializable")
+
+# Write data structures that use DatsObj to a JSON file, indented by 2 spaces if pretty is True.
+# Uses the standard json module and DATSEncoder unless use_orjson is True, in which case orjson
+# (C-native encoding, including DatsObj via dats_orjson_default) must be installed. Note that the
+# orjson output is not byte-identical: it writes non-ASCII characters as raw UTF-8 rather than
+# \uXXXX escapes, formats some floats differently (e.g., 1e16 vs. 1e+16), and rejects non-str
+# dict keys.
+def write_dats_json(obj, output_file, pretty=False, use_orjson=False):
+    if use_orjson:
+        if orjson is None:
+            logging.fatal("orjson output requested but the orjson package is not installed")
+            sys.exit(1)
+        option = orjson.OPT_INDENT_2 if pretty else 0
+        with open(output_file, mode="wb") as jf:
+            jf.write(orjson.dumps(obj, default=dats_orjson_default, option=option))
+        return
+
+    with open(output_file, mode="w", buffering=OUTPUT_BUFFER_SIZE) as jf:
+        if pretty:
+            # indented output always goes through the json module's pure-Python encoder, so stream it
+            json.dump(obj, jf, indent=2, cls=DATSEncoder)
+        else:
+            # only json.dumps (not json.dump) uses the C encoder, at the cost of building the whole string in memory
+            jf.write(json.dumps(obj, separators=(',', ':'), cls=DATSEncoder))
         
 
 # ------------------------------------------------------
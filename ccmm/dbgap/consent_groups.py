@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+
+from ccmm.dats.datsobj import DatsObj
+import logging
+import sys
+
+# ------------------------------------------------------
+# Global variables
+# ------------------------------------------------------
+
+# Consent group name -> (abbreviation, Data Use Ontology term), or None if there is no consent.
+# Data Use Ontology for consent info - http://www.obofoundry.org/ontology/duo.html
+#
+# Consent groups that appear in more than one dbGaP study. Each study-specific conversion
+# script passes make_consent_info a table that extends these with its own groups.
+COMMON_CONSENT_GROUPS = {
+    #  http://purl.obolibrary.org/obo/DUO_0000005 - "general research use and clinical care"
+    #  "This primary category consent code indicates that use is allowed for health/medical/biomedical 
+    # purposes and other biological research, including the study of population origins or ancestry."
+    "General Research Use (GRU)": ("GRU", "http://purl.obolibrary.org/obo/DUO_0000005"),
+    "Subjects did not participate in the study, did not complete a consent document and are included only for the pedigree structure and/or genotype controls, such as HapMap subjects": None
+}
+
+# ------------------------------------------------------
+# consent_groups
+# ------------------------------------------------------
+
+# Create DATS ConsentInfo for a named consent group, using a table in the format of COMMON_CONSENT_GROUPS
+def make_consent_info(group_name, consent_groups):
+    # ignore any stray leading/trailing whitespace in the dbGaP group name
+    cg_key = group_name.strip()
+    if cg_key not in consent_groups:
+        logging.fatal("unrecognized consent group " + group_name)
+        sys.exit(1)
+    cg = consent_groups[cg_key]
+
+    # subjects who did not consent
+    if cg is None:
+        return DatsObj("ConsentInfo", [
+            ("name", group_name),
+            ("description", group_name)
+        ])
+
+    (abbreviation, duo_term) = cg
+    return DatsObj("ConsentInfo", [
+        ("name", group_name),
+        ("abbreviation", abbreviation),
+        ("description", group_name),
+        ("relatedIdentifiers", [
+            DatsObj("RelatedIdentifier", [("identifier", duo_term)])
+        ])
+    ])
@@ -38,6 +38,10 @@ METADATA_TYPES = [
 ]
 
 METADATA_TYPES_RE = '|'.join(METADATA_TYPES)
+
+# variable types recorded as study Dimensions by add_study_vars, in output order
+# (kept as a sequence rather than a set so that the order of the Dimensions is stable)
+STUDY_VAR_TYPES = ('Subject', 'Subject_Phenotypes', 'Sample', 'Sample_Attributes')
  
 # expected attribute values for the <stat> element
 STAT_ATTRIBS = {
@@ -356,47 +360,47 @@ def add_study_vars(study, study_md):
     # maps variable type (e.g., Subject, Sample_Attributes), name and consent group to DATS dimension and variable report
     type_name_cg_to_var = {}
 
-    for var_type in ('Subject', 'Subject_Phenotypes', 'Sample', 'Sample_Attributes'):
-        if var_type in study_md:
-            var_data = study_md[var_type]['data_dict']['data']
-            vars = var_data['vars']
-            vdict = {}
-            type_name_cg_to_var[var_type] = vdict
-
-            for var in vars:
-                var_name = var['name']
-                id = DatsObj("Identifier", [
-                    ("identifier",  var['id']),
-                    ("identifierSource", "dbGaP")])
-        
-                dim = DatsObj("Dimension", [
-                    ("identifier", id),
-                    ("name", DatsObj("Annotation", [("value", var_name)])),
-                    ("description", var['description'])
-                    # TODO: include stats
-                ])  
-
-                study.getProperty("dimensions").append(dim)
-            
-                # track dbGaP variable Dimension and variable report by dbGaP id
-                if var['id'] in id_to_var:
-                    logging.fatal("duplicate definition found for dbGaP variable " + var_name + " with accession=" + var['id'])
-                    sys.exit(1)
-
-                t ={"dim": dim, "var": var}
-                id_to_var[var['id']] = t
-                
-                # track by name and consent group
-                m = re.match(r'^(.*)(\.(c\d+))$', var['id'])
+    # only those variable types present in the study metadata
+    for var_type in [vt for vt in STUDY_VAR_TYPES if vt in study_md]:
+        var_data = study_md[var_type]['data_dict']['data']
+        vars = var_data['vars']
+        vdict = {}
+        type_name_cg_to_var[var_type] = vdict
+
+        for var in vars:
+            var_name = var['name']
+            id = DatsObj("Identifier", [
+                ("identifier",  var['id']),
+                ("identifierSource", "dbGaP")])
+    
+            dim = DatsObj("Dimension", [
+                ("identifier", id),
+                ("name", DatsObj("Annotation", [("value", var_name)])),
+                ("description", var['description'])
+                # TODO: include stats
+            ])  
+
+            study.getProperty("dimensions").append(dim)
         
-                if m is None:
-                    suffix = ""
-                else:
-                    suffix = "." + m.group(3)
+            # track dbGaP variable Dimension and variable report by dbGaP id
+            if var['id'] in id_to_var:
+                logging.fatal("duplicate definition found for dbGaP variable " + var_name + " with accession=" + var['id'])
+                sys.exit(1)
 
-                key = "".join([var_name, suffix])
-                if key in vdict:
-                    logging.fatal("duplicate definition found for dbGaP variable " + key + " in " + var_type + " file")
-                vdict[key] = t
+            t ={"dim": dim, "var": var}
+            id_to_var[var['id']] = t
+            
+            # track by name and consent group
+            m = re.match(r'^(.*)(\.(c\d+))$', var['id'])
+    
+            if m is None:
+                suffix = ""
+            else:
+                suffix = "." + m.group(3)
+
+            key = "".join([var_name, suffix])
+            if key in vdict:
+                logging.fatal("duplicate definition found for dbGaP variable " + key + " in " + var_type + " file")
+            vdict[key] = t
 
     return { "id_to_var": id_to_var, "type_name_cg_to_var": type_name_cg_to_var }
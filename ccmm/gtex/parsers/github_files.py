@@ -127,13 +127,15 @@ def read_tissue_id_file(id_file):
 # Manifest file parsing
 # ------------------------------------------------------
 
-def read_protected_rnaseq_manifest(manifest_file):
-    rnaseq_cram_files = util.read_csv_metadata_file(manifest_file, RNASEQ_MANIFEST_COLS, 'sample_id')
+# limit - optional maximum number of CRAM files to read (for testing purposes)
+def read_protected_rnaseq_manifest(manifest_file, limit=None):
+    rnaseq_cram_files = util.read_csv_metadata_file(manifest_file, RNASEQ_MANIFEST_COLS, 'sample_id', limit)
     logging.info("Read " + str(len(rnaseq_cram_files)) + " CRAM file(s) from " + manifest_file)
     return rnaseq_cram_files
 
-def read_protected_wgs_manifest(manifest_file):
-    wgs_cram_files = util.read_csv_metadata_file(manifest_file, WGS_MANIFEST_COLS, 'sample_id')
+# limit - optional maximum number of CRAM files to read (for testing purposes)
+def read_protected_wgs_manifest(manifest_file, limit=None):
+    wgs_cram_files = util.read_csv_metadata_file(manifest_file, WGS_MANIFEST_COLS, 'sample_id', limit)
     logging.info("Read " + str(len(wgs_cram_files)) + " CRAM file(s) from " + manifest_file)
     return wgs_cram_files
 
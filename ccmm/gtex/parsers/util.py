@@ -5,6 +5,15 @@ import logging
 import re
 import sys
 
+# ------------------------------------------------------
+# Global variables
+# ------------------------------------------------------
+
+# read buffer size for metadata/manifest files
+READ_BUFFER_SIZE = 8 * 1024 * 1024
+
+INTEGER_PREFIX_RE = re.compile(r'^(\d+)')
+
 # ------------------------------------------------------
 # Error handling
 # ------------------------------------------------------
@@ -27,12 +36,16 @@ def fatal_parse_error(err_msg, file, lnum):
 #      {'id': 'SMCENTER',  'cv': [ 'B1', 'C1', 'D1', 'B1, A1', 'C1, A1', 'D1, A1' ] , 'empty_ok': True }
 #   ]
 # id_column - name of the primary key columns
+# limit - optional maximum number of rows to read, after which the rest of the file is ignored (for testing purposes)
 #
-def read_csv_metadata_file(file_path, column_metadata, id_column):
+def read_csv_metadata_file(file_path, column_metadata, id_column, limit=None):
     # rows indexed by the value in id_column
     rows = {}
 
-    with open(file_path) as fh:
+    # compile column regexes once per file, not once per value
+    col_regexes = [re.compile(col['regex']) if 'regex' in col else None for col in column_metadata]
+
+    with open(file_path, newline='', buffering=READ_BUFFER_SIZE) as fh:
         reader = csv.reader(fh, delimiter='\t')
         lnum = 0
         for line in reader:
@@ -48,10 +61,12 @@ def read_csv_metadata_file(file_path, column_metadata, id_column):
 
             # parse column values
             else:
+                if limit is not None and len(rows) >= limit:
+                    break
                 cnum = 0
                 parsed_row = {}
 
-                for col in column_metadata:
+                for col, col_regex in zip(column_metadata, col_regexes):
                     colname = col['id']
                     colval = line[cnum]
                     parsed_col = { "raw_value": colval }
@@ -64,15 +79,14 @@ def read_csv_metadata_file(file_path, column_metadata, id_column):
                             fatal_parse_error("Missing value in column " + str(cnum+1) + "/" + colname + " but empty_ok = False.", file_path, lnum)
 
                     # check regex if present
-                    elif 'regex' in col:
-                        regex = col['regex']
-                        m = re.match(regex, colval)
+                    elif col_regex is not None:
+                        m = col_regex.match(colval)
                         if m is None:
-                            fatal_parse_error("Value in column '" + str(cnum+1) + "' ('" + colval+ "') does not match regex " + str(regex), file_path, lnum)
+                            fatal_parse_error("Value in column '" + str(cnum+1) + "' ('" + colval+ "') does not match regex " + str(col['regex']), file_path, lnum)
 
                     # integer_cv
                     elif 'integer_cv' in col:
-                        m = re.match(r'^(\d+)', colval)
+                        m = INTEGER_PREFIX_RE.match(colval)
                         if m is None:
                             fatal_parse_error("Value in column '" + str(cnum+1) + "' ('" + colval+ "') is not an integer.", file_path, lnum)
                             
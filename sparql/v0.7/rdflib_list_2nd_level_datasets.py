@@ -2,6 +2,7 @@
 
 import argparse
 import logging
+from operator import itemgetter
 import rdflib 
 import rdflib_util as ru
 import re
@@ -12,7 +13,7 @@ import sys
 # GTEx JSON-LD file.
 
 
-def list_2nd_level_datasets(g):
+def list_2nd_level_datasets(g, index=None):
     
     #    SELECT ?ident ?title
     #            WHERE {
@@ -27,7 +28,10 @@ def list_2nd_level_datasets(g):
     #            }
 
     # find ALL Datasets
-    all_datasets = [s for (s,p,o) in g.triples((None, ru.RDF_TYPE_TERM, ru.DATS_DATASET_TERM))]
+    if index is not None:
+        all_datasets = index.datasets
+    else:
+        all_datasets = list(g.subjects(ru.RDF_TYPE_TERM, ru.DATS_DATASET_TERM))
 
     #    SELECT ?ident ?title
     #            WHERE {
@@ -48,7 +52,7 @@ def list_2nd_level_datasets(g):
 
     for d in all_datasets:
         for tt in title_terms:
-            for (s,p,o) in g.triples((d, ru.TITLE_TERM, tt)):
+            if (d, ru.TITLE_TERM, tt) in g:
                 datasets.append(d)
 
     #    SELECT ?ident ?title
@@ -66,7 +70,7 @@ def list_2nd_level_datasets(g):
     # find all entities linked by "has part" to the top-level GTEx and TOPMed Datasets
     l2_entities = []
     for d in datasets:
-        for (s,p,o) in g.triples((s, ru.HAS_PART_TERM, None)):
+        for o in g.objects(d, ru.HAS_PART_TERM):
             l2_entities.append(o)
 
     #    SELECT ?ident ?title
@@ -84,8 +88,7 @@ def list_2nd_level_datasets(g):
     # filter l2_entities, keeping only those that are Datasets
     l2_datasets = []
     for e in l2_entities:
-        l = [t for t in g.triples((e, ru.RDF_TYPE_TERM, ru.DATS_DATASET_TERM))]
-        if len(l) > 0:
+        if (e, ru.RDF_TYPE_TERM, ru.DATS_DATASET_TERM) in g:
             l2_datasets.append(e)
 
     #    SELECT ?ident ?title
@@ -105,12 +108,9 @@ def list_2nd_level_datasets(g):
     titles = []
     ids = []
 
-    id_term = rdflib.term.Literal('Genotype-Tissue Expression Project (GTEx)', datatype=ru.CENTRAL_ID_TERM)
     for d in l2_datasets:
-        for (s,p,o) in g.triples((d, ru.TITLE_TERM, None)):
-            titles.append(o)
-        for (s,p,o) in g.triples((d, ru.CENTRAL_ID_TERM, None)):
-            ids.append(o)
+        titles.extend(g.objects(d, ru.TITLE_TERM))
+        ids.extend(g.objects(d, ru.CENTRAL_ID_TERM))
 
     #    SELECT ?ident ?title
     #            WHERE {
@@ -127,8 +127,7 @@ def list_2nd_level_datasets(g):
     # One more step needed to get from DATS Identifier to the actual id.
     idents = []
     for i in ids:
-        for (s,p,o) in g.triples((i, ru.SDO_IDENT_TERM, None)):
-            idents.append(o)
+        idents.extend(g.objects(i, ru.SDO_IDENT_TERM))
 
     datasets_l = []
 
@@ -137,7 +136,7 @@ def list_2nd_level_datasets(g):
         datasets_l.append({"dataset": idents[i], "description": titles[i] })
 
     # sort to ensure consistent results
-    datasets_l.sort(key=lambda x: x["dataset"])
+    datasets_l.sort(key=itemgetter("dataset"))
     return datasets_l
 
 def print_results(datasets):
@@ -1,6 +1,8 @@
 #!/usr/bin/env python3
 
 import argparse
+from collections import namedtuple
+import itertools
 import logging
 import rdflib 
 import rdflib_util as ru
@@ -8,9 +10,16 @@ import re
 import sys
 
 # Implementation of "list dataset variables" query directly in Python using
-# rdflib API calls.
+# rdflib API calls. list_dataset_variables() is a generator that yields one
+# variable (a Var tuple) at a time, in sorted order.
 
-def list_dataset_variables(g, dataset_id=None):
+# number of result rows formatted and written to stdout per write() call
+PRINT_CHUNK_SIZE = 4096
+
+# one result row; plain tuple ordering sorts rows by study and then variable id
+Var = namedtuple("Var", "study var_dbgap_id var_name var_descr")
+
+def list_dataset_variables(g, dataset_id=None, index=None):
     
     # obo:IAO_0000100 - "data set"
     # obo:IAO_0000577 - "centrally registered identifier symbol"
@@ -22,81 +31,10 @@ def list_dataset_variables(g, dataset_id=None):
     #            SELECT DISTINCT ?dbgap_study_acc ?dbgap_var_acc ?pname ?descr
     #            WHERE {
     #  ---->         ?dataset a obo:IAO_0000100.
-    #                ?dataset obo:IAO_0000577 ?dataset_id.
-    #                ?dataset_id sdo:identifier ?dbgap_study_acc.
-    #                ?dataset obo:BFO_0000051 ?dim1.
-    #                ?dim1 a obo:STATO_0000258.
-    #                ?dim1 obo:IAO_0000300 ?descr.
-    #                ?dim1 obo:IAO_0000577 ?dim1_id.
-    #                ?dim1_id sdo:identifier ?dbgap_var_acc.
-    #                ?dim1 obo:IAO_0000590 ?propname.
-    #                ?propname sdo:value ?pname.
-    #            }
-    #            ORDER BY ?dbgap_study_acc ?dbgap_var_acc
-
-    # find ALL Datasets
-    all_datasets = [s for (s,p,o) in g.triples((None, None, ru.DATS_DATASET_TERM))]
-
-    #            SELECT DISTINCT ?dbgap_study_acc ?dbgap_var_acc ?pname ?descr
-    #            WHERE {
-    #                ?dataset a obo:IAO_0000100.
     #  ---->         ?dataset obo:IAO_0000577 ?dataset_id.
     #  ---->         ?dataset_id sdo:identifier ?dbgap_study_acc.
-    #                ?dataset obo:BFO_0000051 ?dim1.
-    #                ?dim1 a obo:STATO_0000258.
-    #                ?dim1 obo:IAO_0000300 ?descr.
-    #                ?dim1 obo:IAO_0000577 ?dim1_id.
-    #                ?dim1_id sdo:identifier ?dbgap_var_acc.
-    #                ?dim1 obo:IAO_0000590 ?propname.
-    #                ?propname sdo:value ?pname.
-    #            }
-    #            ORDER BY ?dbgap_study_acc ?dbgap_var_acc
-
-    # get DATS identifier for each one - DATS schema specifies the mapping should be 1-1
-    dataset_ids = {}
-    datasets = []
-    for d in all_datasets:
-        for (s,p,o) in g.triples((d,ru.CENTRAL_ID_TERM,None)):
-            for (s2,p2,o2) in g.triples((o, ru.SDO_IDENT_TERM, None)):
-                dataset_ids[d] = o2
-        if d in dataset_ids:
-            datasets.append(d)
-                
-    # filter datasets by id if one was specified
-    datasets = [d for d in datasets if (dataset_id is None) or (rdflib.term.Literal(dataset_id) == dataset_ids[d])]
-
-    #            SELECT DISTINCT ?dbgap_study_acc ?dbgap_var_acc ?pname ?descr
-    #            WHERE {
-    #                ?dataset a obo:IAO_0000100.
-    #                ?dataset obo:IAO_0000577 ?dataset_id.
-    #                ?dataset_id sdo:identifier ?dbgap_study_acc.
     #  ---->         ?dataset obo:BFO_0000051 ?dim1.
-    #  ---->         ?dim1 a obo:STATO_0000258
-    #                ?dim1 obo:IAO_0000300 ?descr.
-    #                ?dim1 obo:IAO_0000577 ?dim1_id.
-    #                ?dim1_id sdo:identifier ?dbgap_var_acc.
-    #                ?dim1 obo:IAO_0000590 ?propname.
-    #                ?propname sdo:value ?pname.
-    #            }
-    #            ORDER BY ?dbgap_study_acc ?dbgap_var_acc
-
-    # get all dimensions of each Dataset
-
-    dataset_dims = {}
-    for d in datasets:
-        dims = []
-        for (s,p,o) in g.triples((d, ru.HAS_PART_TERM, None)):
-            for (s2,p2,o2) in g.triples((o, ru.RDF_TYPE_TERM, ru.DATS_DIMENSION_TERM)):
-                dims.append(o)
-        dataset_dims[d] = dims
-
-    #            SELECT DISTINCT ?dbgap_study_acc ?dbgap_var_acc ?pname ?descr
-    #            WHERE {
-    #                ?dataset a obo:IAO_0000100.
-    #                ?dataset obo:IAO_0000577 ?dataset_id.
-    #                ?dataset_id sdo:identifier ?dbgap_study_acc.
-    #                ?dataset obo:BFO_0000051 ?dim1.
-    #                ?dim1 a obo:STATO_0000258.
+    #  ---->         ?dim1 a obo:STATO_0000258.
     #  ---->         ?dim1 obo:IAO_0000300 ?descr.
     #  ---->         ?dim1 obo:IAO_0000577 ?dim1_id.
     #  ---->         ?dim1_id sdo:identifier ?dbgap_var_acc.
@@ -105,28 +43,27 @@ def list_dataset_variables(g, dataset_id=None):
     #            }
     #            ORDER BY ?dbgap_study_acc ?dbgap_var_acc
 
-    # get Dimension description
-    dim_descrs = {}
-    for d in datasets:
-        for dim in dataset_dims[d]:
-            for (s,p,o) in g.triples((dim, ru.DESCR_TERM, None)):
-                dim_descrs[dim] = o
-
-    # get Dimension identifier
-    dim_ids = {}
-    for d in datasets:
-        for dim in dataset_dims[d]:
-            for (s,p,o) in g.triples((dim, ru.CENTRAL_ID_TERM, None)):
-                for(s2,p2,o2) in g.triples((o, ru.SDO_IDENT_TERM, None)):
-                    dim_ids[dim] = o2
-
-    # get Dimension name
-    dim_names = {}
-    for d in datasets:
-        for dim in dataset_dims[d]:
-            for (s,p,o) in g.triples((dim, ru.NAME_TERM, None)):
-                for(s2,p2,o2) in g.triples((o, ru.SDO_VALUE_TERM, None)):
-                    dim_names[dim] = o2
+    # find the Datasets, their identifiers, Dimensions, and Dimension attributes
+    ident = None if dataset_id is None else rdflib.term.Literal(dataset_id)
+    if (index is None) and (ident is not None):
+        # only the Dataset(s) with the requested identifier need their Dimensions indexed
+        datasets = ru.find_datasets_by_id(g, ident)
+        dataset_ids = dict.fromkeys(datasets, ident)
+        dim_info = {}
+        dataset_dims = {d: ru.get_dataset_dims(g, d, dim_info) for d in datasets}
+    else:
+        if index is None:
+            index = ru.DatsIndex(g)
+        dataset_ids = index.dataset_ids
+        dataset_dims = index.dataset_dims
+        dim_info = index.dim_info
+        # filter datasets by id if one was specified
+        if ident is None:
+            datasets = list(dataset_ids)
+        else:
+            datasets = ru.find_datasets_by_id(g, ident, dataset_ids)
+    if not datasets:
+        return
 
     #            SELECT DISTINCT ?dbgap_study_acc ?dbgap_var_acc ?pname ?descr
     #            WHERE {
@@ -143,20 +80,21 @@ def list_dataset_variables(g, dataset_id=None):
     #            }
     #  ---->     ORDER BY ?dbgap_study_acc ?dbgap_var_acc
 
-    datasets_with_ids = [{"d":d, "i":dataset_ids[d]} for d in datasets if d in dataset_ids]
-    datasets_with_ids.sort(key=lambda x: x["i"])
-    variables_l = []
-
-    for ds in datasets_with_ids:
-        dims = dataset_dims[ds['d']]
-        # filter out those with no id
-        # (may still fail if the description or name are missing)
-        dims_with_atts = [{"d":d, "descr": dim_descrs[d], "id": dim_ids[d], "name": dim_names[d] } for d in dims if d in dim_ids]
-        dims_with_atts.sort(key = lambda x: x["id"])
-        for d in dims_with_atts:
-            variables_l.append({"study": ds["i"], "var_dbgap_id": d["id"], "var_name": d["name"], "var_descr": d["descr"] })
-
-    return variables_l
+    # identifiers are converted to str once, up front, so that the sorts compare plain
+    # strings rather than going through rdflib's Literal ordering on every comparison
+    datasets_with_ids = [(str(dataset_ids[d]), d) for d in datasets]
+    datasets_with_ids.sort()
+
+    for (study, ds) in datasets_with_ids:
+        # filter out those with no id, description, or name
+        rows = []
+        for d in dataset_dims[ds]:
+            info = dim_info.get(d)
+            if info is not None:
+                (descr, ident, name) = info
+                rows.append(Var(study, str(ident), str(name), str(descr)))
+        rows.sort()
+        yield from rows
 
 def print_results(variables, dataset_id=None):
     title = "Dataset variables"
@@ -169,8 +107,13 @@ def print_results(variables, dataset_id=None):
     print()
     print("dbGaP Study\tdbGaP variable\tName\tDescription")
 
-    for v in variables:
-        print("%s\t%s\t%s\t%s" % (v["study"], v["var_dbgap_id"], v["var_name"], v["var_descr"]))
+    # variables may be a generator, so rows are formatted and written in chunks as they are produced
+    variables = iter(variables)
+    while True:
+        chunk = list(itertools.islice(variables, PRINT_CHUNK_SIZE))
+        if not chunk:
+            break
+        sys.stdout.write("".join(["%s\t%s\t%s\t%s\n" % v for v in chunk]))
 
     print()
 
@@ -184,13 +127,15 @@ def main():
     parser = argparse.ArgumentParser(description='List variables available in the DATS Dataset that corresponds to a given dbGaP study.')
     parser.add_argument('--dats_file', help ='Path to TOPMed or GTEx DATS JSON file.')
     parser.add_argument('--dataset_id', required=False, help ='DATS identifier of the Dataset whose variables should be retrieved.')
+    parser.add_argument('--rdflib_store', required=False, default=ru.DEFAULT_STORE, help ='rdflib Store plugin to load the graph into, e.g., "Oxigraph" (requires oxrdflib).')
+    parser.add_argument('--cache_graph', action='store_true', help ='Cache the parsed graph under ' + ru.GRAPH_CACHE_DIR + ' and reuse it on subsequent runs.')
     args = parser.parse_args()
 
     # logging
     logging.basicConfig(level=logging.INFO)
 
     # parse JSON LD
-    g = ru.read_json_ld_graph(args.dats_file)
+    g = ru.read_json_ld_graph(args.dats_file, args.rdflib_store, args.cache_graph)
 
     # run query
     variables = list_dataset_variables(g, args.dataset_id)
@@ -10,7 +10,7 @@ import sys
 # Implementation of "list study group members" query directly in Python using
 # rdflib API calls.
 
-def list_study_group_members(g, dataset_id=None, study_group_name=None):
+def list_study_group_members(g, dataset_id=None, study_group_name=None, index=None):
     
     # obo:IAO_0000100 - "data set"
     # obo:IAO_0000577 - "centrally registered identifier symbol"
@@ -39,18 +39,25 @@ def list_study_group_members(g, dataset_id=None, study_group_name=None):
     #            ORDER BY ?dbgap_study_acc ?study_group_name ?subject_name
     
     # find ALL Datasets, retain those with a DATS identifier
-    all_datasets = [s for (s,p,o) in g.triples((None, None, ru.DATS_DATASET_TERM))]
-    dataset_ids = {}
-    datasets = []
-    for d in all_datasets:
-        for (s,p,o) in g.triples((d, ru.CENTRAL_ID_TERM, None)):
-            for (s2,p2,o2) in g.triples((o, ru.SDO_IDENT_TERM, None)):
-                dataset_ids[d] = o2
-        if d in dataset_ids:
+    if index is not None:
+        dataset_ids = index.dataset_ids
+        datasets = list(dataset_ids)
+    else:
+        dataset_ids = {}
+        datasets = []
+        for d in g.subjects(ru.RDF_TYPE_TERM, ru.DATS_DATASET_TERM):
+            cid = g.value(d, ru.CENTRAL_ID_TERM)
+            if cid is None:
+                continue
+            ident = g.value(cid, ru.SDO_IDENT_TERM)
+            if ident is None:
+                continue
+            dataset_ids[d] = ident
             datasets.append(d)
 
     # filter datasets by id if one was specified
-    datasets = [d for d in datasets if (dataset_id is None) or (rdflib.term.Literal(dataset_id) == dataset_ids[d])]
+    if dataset_id is not None:
+        datasets = ru.find_datasets_by_id(g, rdflib.term.Literal(dataset_id), dataset_ids)
 
     #            SELECT ?dbgap_study_acc ?study_group_name ?subject_name
     #            WHERE {
@@ -71,8 +78,8 @@ def list_study_group_members(g, dataset_id=None, study_group_name=None):
     # link each Dataset to Study (should be 1-1)
     ds_to_study = {}
     for d in datasets:
-        for (s,p,o) in g.triples((d, ru.PRODUCED_BY_TERM, None)):
-            for (s2,p2,o2) in g.triples((o, ru.RDF_TYPE_TERM, ru.DATS_STUDY_TERM)):
+        for o in g.objects(d, ru.PRODUCED_BY_TERM):
+            if (o, ru.RDF_TYPE_TERM, ru.DATS_STUDY_TERM) in g:
                 ds_to_study[d] = o
 
     # filter Datasets not linked to a study
@@ -99,15 +106,14 @@ def list_study_group_members(g, dataset_id=None, study_group_name=None):
     study_group_to_name = {}
     for s in ds_to_study.values():
         groups = []
-        for (s,p,o) in g.triples((s, ru.HAS_PART_TERM, None)):
-            for (s2,p2,o2) in g.triples((o, ru.RDF_TYPE_TERM, ru.DATS_STUDY_GROUP_TERM)):
+        for o in g.objects(s, ru.HAS_PART_TERM):
+            if (o, ru.RDF_TYPE_TERM, ru.DATS_STUDY_GROUP_TERM) in g:
                 # get name
-                n_names = 0
-                for (s3,p3,o3) in g.triples((o, ru.NAME_TERM, None)):
-                    study_group_to_name[o] = o3
-                    n_names += 1
+                names = list(g.objects(o, ru.NAME_TERM))
+                if len(names) > 0:
+                    study_group_to_name[o] = names[-1]
 
-                if n_names == 1:
+                if len(names) == 1:
                     groups.append(o)
 
         study_to_groups[s] = groups
@@ -133,9 +139,9 @@ def list_study_group_members(g, dataset_id=None, study_group_name=None):
     subject_to_name = {}
     for sg in study_group_to_name.keys():
         subjects = []
-        for (s,p,o) in g.triples((sg, ru.HAS_MEMBER_TERM, None)):
-            for (s2,p2,o2) in g.triples((o, ru.RDF_TYPE_TERM, ru.DATS_MATERIAL_TERM)):
-                for (s3,p3,o3) in g.triples((o, ru.NAME_TERM, None)):
+        for o in g.objects(sg, ru.HAS_MEMBER_TERM):
+            if (o, ru.RDF_TYPE_TERM, ru.DATS_MATERIAL_TERM) in g:
+                for o3 in g.objects(o, ru.NAME_TERM):
                     subject_to_name[o] = o3
                 subjects.append(o)
         study_group_to_subjects[sg] = subjects
@@ -157,6 +163,7 @@ def list_study_group_members(g, dataset_id=None, study_group_name=None):
     #  ---->     ORDER BY ?dbgap_study_acc ?study_group_name ?subject_name
 
     members_l = []
+    target_group_name = rdflib.term.Literal(study_group_name, lang="en") if study_group_name is not None else None
 
     # sort datasets
     datasets.sort(key=lambda x: dataset_ids[x])
@@ -172,7 +179,7 @@ def list_study_group_members(g, dataset_id=None, study_group_name=None):
             subjects = study_group_to_subjects[g]
 
             # filter by study group
-            if (study_group_name is not None) and group_name != rdflib.term.Literal(study_group_name, lang="en"):
+            if (target_group_name is not None) and group_name != target_group_name:
                 continue
             
             # sort subjects
@@ -29,27 +29,32 @@ def main():
     # input
     parser = argparse.ArgumentParser(description='Run test queries on TOPMed instance.')
     parser.add_argument('--dats_file', help ='Path to TOPMed or GTEx DATS JSON-LD file.')
+    parser.add_argument('--rdflib_store', required=False, default=ru.DEFAULT_STORE, help ='rdflib Store plugin to load the graph into, e.g., "Oxigraph" (requires oxrdflib).')
+    parser.add_argument('--cache_graph', action='store_true', help ='Cache the parsed graph under ' + ru.GRAPH_CACHE_DIR + ' and reuse it on subsequent runs.')
     args = parser.parse_args()
 
     # logging
     logging.basicConfig(level=logging.INFO)
 
     # parse JSON LD
-    g = ru.read_json_ld_graph(args.dats_file)
+    g = ru.read_json_ld_graph(args.dats_file, args.rdflib_store, args.cache_graph)
+
+    # derived lookup tables shared by all of the queries below
+    idx = ru.DatsIndex(g)
 
     # list 2nd-level datasets
-    datasets = rdflib_list_2nd_level_datasets.list_2nd_level_datasets(g)
+    datasets = rdflib_list_2nd_level_datasets.list_2nd_level_datasets(g, index=idx)
     rdflib_list_2nd_level_datasets.print_results(datasets)
     
     # list dataset variables
     for dataset_id in (DATASETS):
-        variables = rdflib_list_dataset_variables.list_dataset_variables(g, dataset_id)
+        variables = rdflib_list_dataset_variables.list_dataset_variables(g, dataset_id, index=idx)
         rdflib_list_dataset_variables.print_results(variables, dataset_id)
 
     # list study group members
     for dataset_id in (DATASETS):
         for study_group in (STUDY_GROUPS):
-            members = rdflib_list_study_group_members.list_study_group_members(g, dataset_id, study_group)
+            members = rdflib_list_study_group_members.list_study_group_members(g, dataset_id, study_group, index=idx)
             rdflib_list_study_group_members.print_results(members, dataset_id, study_group)
 
     # create tabular data dump
@@ -1,7 +1,11 @@
 #!/usr/bin/env python3
 
 import argparse
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
+import io
 import logging
+import multiprocessing
 import rdflib 
 import rdflib_util as ru
 import rdflib_list_2nd_level_datasets
@@ -16,38 +20,85 @@ import sys
 DATASETS = ['phs000424.v7.p2']
 STUDY_GROUPS = ['all subjects']
 
+# graph and derived index, set in main() before the worker processes are forked so
+# that each worker inherits them instead of having them pickled and sent over
+GRAPH = None
+INDEX = None
+
+# ------------------------------------------------------
+# Queries
+# ------------------------------------------------------
+
+# Each of the following runs one query (in a worker process, if fork is available) and returns its printed
+# output, so that main() can write the results in a fixed order.
+
+def run_2nd_level_datasets_query():
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        datasets = rdflib_list_2nd_level_datasets.list_2nd_level_datasets(GRAPH, index=INDEX)
+        rdflib_list_2nd_level_datasets.print_results(datasets)
+    return out.getvalue()
+
+def run_dataset_variables_query():
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        variables = rdflib_list_dataset_variables.list_dataset_variables(GRAPH, index=INDEX)
+        rdflib_list_dataset_variables.print_results(variables)
+    return out.getvalue()
+
+def run_study_group_members_query():
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        for dataset_id in (DATASETS):
+            for study_group in (STUDY_GROUPS):
+                members = rdflib_list_study_group_members.list_study_group_members(GRAPH, dataset_id, study_group, index=INDEX)
+                rdflib_list_study_group_members.print_results(members, dataset_id, study_group)
+    return out.getvalue()
+
+def run_tabular_dump_query():
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        rdflib_tabular_dump.print_tabular_dump(GRAPH)
+    return out.getvalue()
+
 # ------------------------------------------------------
 # main()
 # ------------------------------------------------------
 
 def main():
+    global GRAPH, INDEX
     
     # input
     parser = argparse.ArgumentParser(description='Run test queries on TOPMed instance.')
     parser.add_argument('--dats_file', help ='Path to TOPMed or GTEx DATS JSON-LD file.')
+    parser.add_argument('--rdflib_store', required=False, default=ru.DEFAULT_STORE, help ='rdflib Store plugin to load the graph into, e.g., "Oxigraph" (requires oxrdflib).')
+    parser.add_argument('--cache_graph', action='store_true', help ='Cache the parsed graph under ' + ru.GRAPH_CACHE_DIR + ' and reuse it on subsequent runs.')
     args = parser.parse_args()
 
     # logging
     logging.basicConfig(level=logging.INFO)
 
     # parse JSON LD
-    g = ru.read_json_ld_graph(args.dats_file)
+    GRAPH = ru.read_json_ld_graph(args.dats_file, args.rdflib_store, args.cache_graph)
 
-    # list 2nd-level datasets
-    datasets = rdflib_list_2nd_level_datasets.list_2nd_level_datasets(g)
-    rdflib_list_2nd_level_datasets.print_results(datasets)
+    # derived lookup tables shared by all of the queries below
+    INDEX = ru.DatsIndex(GRAPH)
 
-    variables = rdflib_list_dataset_variables.list_dataset_variables(g)
-    rdflib_list_dataset_variables.print_results(variables)
-    
-    # list study group members
-    for dataset_id in (DATASETS):
-        for study_group in (STUDY_GROUPS):
-            members = rdflib_list_study_group_members.list_study_group_members(g, dataset_id, study_group)
-            rdflib_list_study_group_members.print_results(members, dataset_id, study_group)
-
-    # create tabular data dump
-    rdflib_tabular_dump.print_tabular_dump(g)
+    # the queries only read the graph, so run them concurrently: list 2nd-level datasets,
+    # list dataset variables, list study group members, and create tabular data dump
+    queries = [run_2nd_level_datasets_query, run_dataset_variables_query, run_study_group_members_query, run_tabular_dump_query]
+
+    # the workers rely on fork to inherit GRAPH and INDEX, so run the queries in turn where
+    # fork is unavailable (e.g., Windows) or unsafe (macOS)
+    if ('fork' not in multiprocessing.get_all_start_methods()) or (sys.platform == 'darwin'):
+        for q in queries:
+            sys.stdout.write(q())
+        return
+
+    with ProcessPoolExecutor(max_workers=len(queries), mp_context=multiprocessing.get_context('fork')) as executor:
+        futures = [executor.submit(q) for q in queries]
+        for f in futures:
+            sys.stdout.write(f.result())
 
 if __name__ == '__main__':
     main()
@@ -1,6 +1,8 @@
 #!/usr/bin/env python3
 
+import hashlib
 import logging
+import os
 import rdflib
 import re
 import sys
@@ -47,18 +49,126 @@ SDO_DISTRIBUTIONS_TERM = rdflib.term.URIRef('https://schema.org/distribution')
 SDO_IDENT_TERM = rdflib.term.URIRef('https://schema.org/identifier')
 SDO_VALUE_TERM = rdflib.term.URIRef('https://schema.org/value')
 
+# namespace prefixes used in the SPARQL queries, for use with prepareQuery(initNs=...)
+SPARQL_NAMESPACES = {
+    'obo': rdflib.Namespace('http://purl.obolibrary.org/obo/'),
+    'sdo': rdflib.Namespace('https://schema.org/')
+}
+
+# rdflib Store plugin used by read_json_ld_graph
+DEFAULT_STORE = 'default'
+
+# directory for N-Triples copies of previously-parsed JSON-LD files (see read_json_ld_graph)
+GRAPH_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "gtec_etl")
+
 # ------------------------------------------------------
 # rdflib_util
 # ------------------------------------------------------
 
-def read_json_ld_graph(file):
+# store is the name of an rdflib Store plugin, e.g., "Oxigraph" if the oxrdflib package
+# is installed, which keeps the triples in a native indexed store but still supports
+# all of the rdflib Graph API calls used by the queries
+#
+# if cache is True the parsed graph is also saved in N-Triples format under GRAPH_CACHE_DIR,
+# keyed by the path, modification time, and size of the JSON-LD file, and subsequent calls
+# read that copy instead, skipping the (much slower) JSON-LD parse
+def read_json_ld_graph(file, store=DEFAULT_STORE, cache=False):
+    cache_file = None
+    if cache:
+        st = os.stat(file)
+        key = hashlib.sha1((os.path.abspath(file) + str(st.st_mtime) + str(st.st_size)).encode()).hexdigest()
+        cache_file = os.path.join(GRAPH_CACHE_DIR, key + ".nt")
+        if os.path.exists(cache_file):
+            logging.info("Reading cached graph for " + file + " from " + cache_file)
+            g = rdflib.Graph(store=store).parse(cache_file, format='nt')
+            logging.info("read " + str(len(g)) + " RDF triple(s)")
+            return g
+
     logging.info("Reading DATS JSON metadata from " + file)
     with open(file, "r") as f:
         json_data = f.read()
     logging.info("read JSON data")
-    logging.info("parsing JSON data")
-    g = rdflib.Graph().parse(data=json_data, format='json-ld')
+    logging.info("parsing JSON data into '" + store + "' store")
+    g = rdflib.Graph(store=store).parse(data=json_data, format='json-ld')
     logging.info("parsing complete")
     logging.info("read " + str(len(g)) + " RDF triple(s)")
+
+    if cache_file is not None:
+        logging.info("writing cached graph to " + cache_file)
+        os.makedirs(GRAPH_CACHE_DIR, exist_ok=True)
+        tmp_file = cache_file + "." + str(os.getpid())
+        g.serialize(destination=tmp_file, format='nt', encoding='utf-8')
+        os.replace(tmp_file, cache_file)
+
     return g
 
+
+# Returns the DATS identifier Literal of Dataset d, or None if it has none.
+def get_dataset_id(g, d):
+    id_node = g.value(d, CENTRAL_ID_TERM)
+    return None if id_node is None else g.value(id_node, SDO_IDENT_TERM)
+
+
+# Returns the Datasets whose identifier is ident, restricted to those in dataset_ids (a map
+# from Dataset to identifier Literal) if it is given. Starts from the identifier and follows
+# the triples back to the Dataset, which uses the object index, instead of testing every Dataset.
+def find_datasets_by_id(g, ident, dataset_ids=None):
+    datasets = []
+    for id_node in g.subjects(SDO_IDENT_TERM, ident):
+        for d in g.subjects(CENTRAL_ID_TERM, id_node):
+            if dataset_ids is not None:
+                if dataset_ids.get(d) == ident:
+                    datasets.append(d)
+            elif ((d, RDF_TYPE_TERM, DATS_DATASET_TERM) in g) and (get_dataset_id(g, d) == ident):
+                datasets.append(d)
+    return datasets
+
+
+# Returns the Dimensions of Dataset d and adds (description, identifier, name) to dim_info
+# for each of them that has all three.
+def get_dataset_dims(g, d, dim_info):
+    # g.value and the term constants are referenced once or more per Dimension, so they are
+    # bound to locals; g.objects is called once per Dataset, and the "in g" containment
+    # check goes through the graph's type, so there is no per-call lookup to save there
+    value = g.value
+    RDF_TYPE = RDF_TYPE_TERM
+    DATS_DIM = DATS_DIMENSION_TERM
+    CENTRAL_ID = CENTRAL_ID_TERM
+    SDO_IDENT = SDO_IDENT_TERM
+    DESCR = DESCR_TERM
+    NAME = NAME_TERM
+    SDO_VALUE = SDO_VALUE_TERM
+
+    dims = []
+    for o in g.objects(d, HAS_PART_TERM):
+        if (o, RDF_TYPE, DATS_DIM) in g:
+            dims.append(o)
+            descr = value(o, DESCR)
+            id_node = value(o, CENTRAL_ID)
+            ident = None if id_node is None else value(id_node, SDO_IDENT)
+            name_node = value(o, NAME)
+            name = None if name_node is None else value(name_node, SDO_VALUE)
+            if descr is not None and ident is not None and name is not None:
+                dim_info[o] = (descr, ident, name)
+    return dims
+
+
+class DatsIndex:
+    """Lookup tables derived from a DATS graph, built once and shared between queries."""
+
+    def __init__(self, g):
+        # all Datasets and the DATS identifier of each - DATS schema specifies the mapping should be 1-1
+        self.datasets = datasets = []
+        self.dataset_ids = dataset_ids = {}
+        for d in g.subjects(RDF_TYPE_TERM, DATS_DATASET_TERM):
+            datasets.append(d)
+            ident = get_dataset_id(g, d)
+            if ident is not None:
+                dataset_ids[d] = ident
+
+        # Dimensions of each identified Dataset, and (description, identifier, name) for
+        # each Dimension that has all three
+        self.dataset_dims = {}
+        self.dim_info = {}
+        for d in dataset_ids:
+            self.dataset_dims[d] = get_dataset_dims(g, d, self.dim_info)
@@ -4,12 +4,45 @@ import argparse
 import logging
 import rdflib 
 import rdflib_util as ru 
+from rdflib.plugins.sparql import prepareQuery
 import re
 import sys
 
 # Implementation of "list variables for a dataset" query in SPARQL/RDFLib.
 # Lists variables available in the DATS Dataset that corresponds to a given dbGaP study.
 
+# obo:IAO_0000100 - "data set"
+# obo:IAO_0000577 - "centrally registered identifier symbol"
+# obo:BFO_0000051 - "has part"
+# obo:STATO_0000258 - "variable"
+# obo:IAO_0000300 - "textual entity"
+# obo:IAO_0000590 - "a textual entity that denotes a particular in reality"
+
+# parsed and translated to SPARQL algebra once, at import time, rather than on every call
+DATASET_VARIABLES_QUERY = prepareQuery(
+            """
+            SELECT ?dbgap_study_acc ?dbgap_var_acc ?pname ?descr
+            WHERE {
+                ?dataset a obo:IAO_0000100.
+                ?dataset obo:IAO_0000577 ?dataset_id.
+                ?dataset_id sdo:identifier ?dbgap_study_acc.
+                ?dataset obo:BFO_0000051 ?dim1.
+                ?dim1 a obo:STATO_0000258.
+                ?dim1 obo:IAO_0000300 ?descr.
+                ?dim1 obo:IAO_0000577 ?dim1_id.
+                ?dim1_id sdo:identifier ?dbgap_var_acc.
+                ?dim1 obo:IAO_0000590 ?propname.
+                ?propname sdo:value ?pname.
+            }
+            ORDER BY ?dbgap_study_acc ?dbgap_var_acc
+            """, initNs = ru.SPARQL_NAMESPACES)
+
+def list_dataset_variables(g, dataset_id=None):
+    bindings = None
+    if dataset_id is not None:
+        bindings = {'dbgap_study_acc': rdflib.term.Literal(dataset_id)}
+    return g.query(DATASET_VARIABLES_QUERY, initBindings = bindings)
+
 # ------------------------------------------------------
 # main()
 # ------------------------------------------------------
@@ -28,34 +61,8 @@ def main():
     # parse JSON LD
     g = ru.read_json_ld_graph(args.dats_file)
 
-    # obo:IAO_0000100 - "data set"
-    # obo:IAO_0000577 - "centrally registered identifier symbol"
-    # obo:BFO_0000051 - "has part"
-    # obo:STATO_0000258 - "variable"
-    # obo:IAO_0000300 - "textual entity"
-    # obo:IAO_0000590 - "a textual entity that denotes a particular in reality"
-
-    bindings = None
-    if args.dataset_id is not None:
-        bindings = {'dbgap_study_acc': rdflib.term.Literal(args.dataset_id)}
-
-    qres = g.query(
-            """
-            SELECT ?dbgap_study_acc ?dbgap_var_acc ?pname ?descr
-            WHERE {
-                ?dataset a obo:IAO_0000100.
-                ?dataset obo:IAO_0000577 ?dataset_id.
-                ?dataset_id sdo:identifier ?dbgap_study_acc.
-                ?dataset obo:BFO_0000051 ?dim1.
-                ?dim1 a obo:STATO_0000258.
-                ?dim1 obo:IAO_0000300 ?descr.
-                ?dim1 obo:IAO_0000577 ?dim1_id.
-                ?dim1_id sdo:identifier ?dbgap_var_acc.
-                ?dim1 obo:IAO_0000590 ?propname.
-                ?propname sdo:value ?pname.
-            }
-            ORDER BY ?dbgap_study_acc ?dbgap_var_acc
-            """, initBindings = bindings)
+    # run query
+    qres = list_dataset_variables(g, args.dataset_id)
 
     print()
     print("Dataset variables:")